@@ -9,6 +9,14 @@ IOCTL_ALLOCATE_TLB = 11
 IOCTL_FREE_TLB = 12
 IOCTL_CONFIGURE_TLB = 13
 
+# full request numbers, i.e. _IO(TENSTORRENT_IOCTL_MAGIC, nr)
+IO_GET_DEVICE_INFO = (TENSTORRENT_IOCTL_MAGIC << 8) | IOCTL_GET_DEVICE_INFO
+IO_QUERY_MAPPINGS = (TENSTORRENT_IOCTL_MAGIC << 8) | IOCTL_QUERY_MAPPINGS
+IO_RESET_DEVICE = (TENSTORRENT_IOCTL_MAGIC << 8) | IOCTL_RESET_DEVICE
+IO_ALLOCATE_TLB = (TENSTORRENT_IOCTL_MAGIC << 8) | IOCTL_ALLOCATE_TLB
+IO_FREE_TLB = (TENSTORRENT_IOCTL_MAGIC << 8) | IOCTL_FREE_TLB
+IO_CONFIGURE_TLB = (TENSTORRENT_IOCTL_MAGIC << 8) | IOCTL_CONFIGURE_TLB
+
 TENSTORRENT_RESET_DEVICE_ASIC_RESET = 4
 TENSTORRENT_RESET_DEVICE_ASIC_DMC_RESET = 5
 TENSTORRENT_RESET_DEVICE_POST_RESET = 6
@@ -53,6 +61,25 @@ class TenstorrentGetDeviceInfoOut(S):
     ("subsystem_id", u16), ("bus_dev_fn", u16), ("max_dma_buf_size_log2", u16), ("pci_domain", u16), ("reserved", u16),
   ]
 
+# in + out halves of an ioctl laid out back to back, so one instance can be handed to fcntl.ioctl directly
+class GetDeviceInfoIoctl(S):
+  _fields_ = [("in_", TenstorrentGetDeviceInfoIn), ("out", TenstorrentGetDeviceInfoOut)]
+
+class QueryMappingsIoctl(S):
+  _fields_ = [("in_", QueryMappingsIn), ("out", TenstorrentMapping * 6)]
+
+class ResetDeviceIoctl(S):
+  _fields_ = [("in_", ResetDeviceIn), ("out", ResetDeviceOut)]
+
+# ioctl struct sizes, computed once instead of on every call
+SZ_RESET_DEVICE_OUT = sizeof(ResetDeviceOut)
+SZ_ALLOCATE_TLB_IN = sizeof(AllocateTlbIn)
+SZ_ALLOCATE_TLB_OUT = sizeof(AllocateTlbOut)
+SZ_FREE_TLB_IN = sizeof(FreeTlbIn)
+SZ_NOC_TLB_CONFIG = sizeof(NocTlbConfig)
+SZ_CONFIGURE_TLB_IN = sizeof(ConfigureTlbIn)
+SZ_GET_DEVICE_INFO_OUT = sizeof(TenstorrentGetDeviceInfoOut)
+
 def as_bytes(obj: ctypes.Structure | ctypes.Union) -> bytes:
   return ctypes.string_at(ctypes.addressof(obj), ctypes.sizeof(obj))
 
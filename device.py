@@ -1,10 +1,14 @@
 from __future__ import annotations
-import ctypes, fcntl, mmap, os, struct, time
+import fcntl, itertools, mmap, os, struct, time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import ClassVar
-from abi import *
+from abi import CB, DevMsgs, GoMsg, LaunchMsg, LocalCBConfig, RemoteCBConfig, as_bytes
+from abi import GetDeviceInfoIoctl, QueryMappingsIoctl, ResetDeviceIoctl, SZ_GET_DEVICE_INFO_OUT, SZ_RESET_DEVICE_OUT
+from abi import IO_GET_DEVICE_INFO, IO_QUERY_MAPPINGS, IO_RESET_DEVICE
+from abi import TENSTORRENT_RESET_DEVICE_ASIC_DMC_RESET, TENSTORRENT_RESET_DEVICE_ASIC_RESET, TENSTORRENT_RESET_DEVICE_POST_RESET
 from tlb import TLBConfig, TLBWindow, TLBMode, TLBSize
-from helpers import _IO, align_down, find_dev_by_bdf, format_bdf, generate_jal_instruction, ioctl, load_pt_load
+from helpers import align_down, format_bdf, generate_jal_instruction, load_pt_load, open_dev, wait_dev_by_bdf
 from configs import Arc, Dram, NocNIU, TensixL1, TensixMMIO
 from pathlib import Path
 from dram import DramAllocator
@@ -16,6 +20,7 @@ class TileGrid:
   # on NoC 1, origin is bottom right.
   ARC: ClassVar[tuple[int, int]] = (8, 0) # ARC tile (same location on both boards)
   TENSIX_Y: ClassVar[tuple[int, int]] = (2, 11)
+  TENSIX_YS: ClassVar[tuple[int, ...]] = tuple(range(TENSIX_Y[0], TENSIX_Y[1] + 1))
   TENSIX_X_P100A: ClassVar[tuple[int, ...]] = (1, 2, 3, 4, 5, 6, 7, 10, 11, 12, 13, 14)  # BH w/ 2 harvested cols
   tensix: list[tuple[int, int]] # all valid tensix (x, y) for unicast (noc0)
   tensix_mcast: list[tuple[int, int]] # multicast x-ranges: [(x0, x1), ...] (y is always 2-11)
@@ -23,9 +28,7 @@ class TileGrid:
 
   @classmethod
   def p100a(cls, harvested_dram_bank: int) -> TileGrid:
-    tensix_cols = list(cls.TENSIX_X_P100A)
-    y0, y1 = cls.TENSIX_Y
-    tensix = [(x, y) for x in tensix_cols for y in range(y0, y1 + 1)]
+    tensix = list(itertools.product(cls.TENSIX_X_P100A, cls.TENSIX_YS))
     tensix_mcast = [(1, 7), (10, 14)]
 
     # dram tiles in bank order (skip the single harvested bank)
@@ -45,7 +48,10 @@ class Device:
     noc_translation_enabled: bool | dict[int, bool] | None = None,
   ):
     self.path = path
-    self.fd = os.open(self.path, os.O_RDWR | os.O_CLOEXEC)
+    self._devinfo_io = GetDeviceInfoIoctl()  # reused by _query_bdf
+    self._reset_io = ResetDeviceIoctl()  # reused by both reset() ioctls
+    self._bdf: str | None = None  # filled on first get_bdf()
+    self.fd = open_dev(self.path)
     self._setup()
     self._assert_arc_booted()
     self.harvested_dram = self.get_harvested_dram_bank()
@@ -65,6 +71,26 @@ class Device:
 
     self.dram = DramAllocator(fd=self.fd, dram_tiles=self.tiles.dram)
 
+  @classmethod
+  def open_many(cls, paths: list[str], **kwargs) -> list[Device]:
+    """Construct one Device per path in parallel; total setup time is the slowest card, not the sum.
+
+    Device keeps all of its state per instance, so distinct paths can be opened from different
+    threads. The long waits in construction (ioctls, ARC boot and firmware-ready polling sleeps)
+    release the GIL and overlap. If any card fails, the ones that did open are closed and the
+    first error is raised.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, len(paths))) as pool:
+      futures = [pool.submit(cls, path, **kwargs) for path in paths]
+    devices, err = [], None
+    for fut in futures:
+      try: devices.append(fut.result())
+      except BaseException as e: err = err or e
+    if err is not None:
+      for dev in devices: dev.close()
+      raise err
+    return devices
+
   def _build_local_cb_blob(self, configs: dict[int, LocalCBConfig], mask: int) -> bytes:
     end = mask.bit_length()
     arr = (LocalCBConfig * end)()
@@ -283,63 +309,59 @@ class Device:
         spans.append((addr, data))
       return spans
 
-    staged = {name: stage_spans(name, segs) for name, segs in fws}
+    # the staged spans are the same for every mcast range, so flatten them once up front
+    # and merge back-to-back spans so each becomes a single write
+    staged: list[tuple[int, bytes]] = []
+    for name, segs in fws:
+      for addr, data in stage_spans(name, segs):
+        if staged and staged[-1][0] + len(staged[-1][1]) == addr:
+          staged[-1] = (staged[-1][0], staged[-1][1] + data)
+        else:
+          staged.append((addr, data))
 
     cfg = TLBConfig(addr=reg_base, noc=0, mcast=True, mode=TLBMode.STRICT)
     y0, y1 = self.tiles.TENSIX_Y
     jal_insn = generate_jal_instruction(TensixL1.BRISC_FIRMWARE_BASE)
     go_msg = struct.pack("<BBBB", 0, 0, 0, DevMsgs.RUN_MSG_INIT)
 
+    trisc0_pc_off = TensixMMIO.RISCV_DEBUG_REG_TRISC0_RESET_PC - reg_base
+    trisc1_pc_off = TensixMMIO.RISCV_DEBUG_REG_TRISC1_RESET_PC - reg_base
+    trisc2_pc_off = TensixMMIO.RISCV_DEBUG_REG_TRISC2_RESET_PC - reg_base
+    ncrisc_pc_off = TensixMMIO.RISCV_DEBUG_REG_NCRISC_RESET_PC - reg_base
+    bank_tables = self._build_bank_noc_tables()
+
+    # Each phase walks every mcast range with a single TLB config, so the window is
+    # reprogrammed once per range per phase instead of flipping STRICT/BULK inside each range.
     with TLBWindow(self.fd, TLBSize.MiB_2) as win:
-      # Phase 1: Write firmware to ALL tiles (hold all in reset)
+      # Phase 1: Hold ALL tiles in reset and set TRISC/NCRISC reset PCs
       for x0, x1 in self.tiles.tensix_mcast:
         cfg.start, cfg.end = (x0, y0), (x1, y1)
         cfg.addr, cfg.mode = reg_base, TLBMode.STRICT
         win.configure(cfg)
         win.writei32(reg_off, TensixMMIO.SOFT_RESET_ALL)  # hold cores in reset
-
-        cfg.mode = TLBMode.ORDERED_BULK
-        for name, spans in staged.items():
-          for addr, data in spans:
-            win.write(addr, data, use_uc=True, restore=False)
-
-        # Write JAL instruction at address 0 for BRISC bootstrap
-        win.write(0x0, jal_insn.to_bytes(4, "little"), use_uc=True, restore=False)
-
-        # Initialize go_msg with signal = RUN_MSG_INIT
-        win.write(TensixL1.GO_MSG, go_msg, use_uc=True, restore=False)
-
-        # Write reset PC registers for TRISC and NCRISC
-        cfg.addr, cfg.mode = reg_base, TLBMode.STRICT
-        win.configure(cfg)
-        trisc0_pc_off = TensixMMIO.RISCV_DEBUG_REG_TRISC0_RESET_PC - reg_base
-        trisc1_pc_off = TensixMMIO.RISCV_DEBUG_REG_TRISC1_RESET_PC - reg_base
-        trisc2_pc_off = TensixMMIO.RISCV_DEBUG_REG_TRISC2_RESET_PC - reg_base
-        ncrisc_pc_off = TensixMMIO.RISCV_DEBUG_REG_NCRISC_RESET_PC - reg_base
         win.writei32(trisc0_pc_off, TensixL1.TRISC0_BASE)
         win.writei32(trisc1_pc_off, TensixL1.TRISC1_BASE)
         win.writei32(trisc2_pc_off, TensixL1.TRISC2_BASE)
         win.writei32(ncrisc_pc_off, TensixL1.NCRISC_FIRMWARE_BASE)
 
-      # Verify firmware was written to first tile before releasing
-      test_tile = self.tiles.tensix[0]
-      cfg.start, cfg.end = test_tile, test_tile
-      cfg.addr, cfg.mode = 0, TLBMode.STRICT
-      cfg.mcast = False
-      win.configure(cfg)
-      cfg.mcast = True
-
-      # Write bank-to-NoC tables to scratch area (firmware reads these during init)
-      bank_tables = self._build_bank_noc_tables()
+      # Phase 2: Write firmware + boot state to ALL tiles
       for x0, x1 in self.tiles.tensix_mcast:
         cfg.start, cfg.end = (x0, y0), (x1, y1)
         cfg.addr, cfg.mode = 0, TLBMode.ORDERED_BULK
         win.configure(cfg)
-        win.write(TensixL1.MEM_BANK_TO_NOC_SCRATCH, bank_tables, use_uc=True, restore=False)
+        for addr, data in staged:
+          win.write(addr, data, use_uc=True, restore=False)
+
+        # Write JAL instruction at address 0 for BRISC bootstrap
+        win.write(0x0, jal_insn.to_bytes(4, "little"), use_uc=True, restore=False)
 
-      cfg.mcast = True
+        # Initialize go_msg with signal = RUN_MSG_INIT
+        win.write(TensixL1.GO_MSG, go_msg, use_uc=True, restore=False)
+
+        # Write bank-to-NoC tables to scratch area (firmware reads these during init)
+        win.write(TensixL1.MEM_BANK_TO_NOC_SCRATCH, bank_tables, use_uc=True, restore=False)
 
-      # Phase 2: Release BRISC on ALL tiles (after all firmware is written)
+      # Phase 3: Release BRISC on ALL tiles (after all firmware is written)
       for x0, x1 in self.tiles.tensix_mcast:
         cfg.start, cfg.end = (x0, y0), (x1, y1)
         cfg.addr, cfg.mode = reg_base, TLBMode.STRICT
@@ -546,16 +568,14 @@ class Device:
         tags_base = csm_offset + 8
         data_base = tags_base + entry_count * 4
 
-        tag_to_offset = {}
-        for i in range(entry_count):
-          tag_offset = arc.readi32(tags_base + i * 4)
-          tag_to_offset[tag_offset & 0xFFFF] = (tag_offset >> 16) & 0xFFFF
+        # the tag table and the data words (entry_count of each) sit back to back: fetch both in one burst
+        words = struct.unpack(f"<{2 * entry_count}I", arc.read(tags_base, entry_count * 8))
+        tag_to_offset = {v & 0xFFFF: (v >> 16) & 0xFFFF for v in words[:entry_count]}
 
-        def read_tag(tag: int, default: int) -> int:
-          off = tag_to_offset.get(tag)
-          return default if off is None else arc.readi32(data_base + off * 4)
-
-        gddr_enabled = read_tag(Arc.TAG_GDDR_ENABLED, Arc.DEFAULT_GDDR_ENABLED)
+        off = tag_to_offset.get(Arc.TAG_GDDR_ENABLED)
+        if off is None: gddr_enabled = Arc.DEFAULT_GDDR_ENABLED
+        elif off < entry_count: gddr_enabled = words[entry_count + off]
+        else: gddr_enabled = arc.readi32(data_base + off * 4)
 
       dram_off = [bank for bank in range(Dram.BANK_COUNT) if ((gddr_enabled >> bank) & 1) == 0]
       assert len(dram_off) == 1, f"expected 1 harvested dram bank, got {dram_off}"
@@ -575,23 +595,28 @@ class Device:
     if hasattr(self, 'dram'): self.dram.close()
     os.close(self.fd)
 
+  # the PCI address is fixed for the life of the card (reset finds it again by this same BDF),
+  # so one GET_DEVICE_INFO is enough
   def get_bdf(self) -> str:
-    info = ioctl(self.fd, IOCTL_GET_DEVICE_INFO, TenstorrentGetDeviceInfoIn,
-                 TenstorrentGetDeviceInfoOut, output_size_bytes=ctypes.sizeof(TenstorrentGetDeviceInfoOut))
-    return format_bdf(info.pci_domain, info.bus_dev_fn)
+    if self._bdf is None: self._bdf = self._query_bdf()
+    return self._bdf
+
+  def _query_bdf(self) -> str:
+    io = self._devinfo_io
+    io.in_.output_size_bytes = SZ_GET_DEVICE_INFO_OUT
+    fcntl.ioctl(self.fd, IO_GET_DEVICE_INFO, io, True)
+    return format_bdf(io.out.pci_domain, io.out.bus_dev_fn)
 
   def _map_bars(self):
-    in_sz = ctypes.sizeof(QueryMappingsIn)
-    out_sz = ctypes.sizeof(TenstorrentMapping)
-    buf = bytearray(in_sz + 6 * out_sz)
-    QueryMappingsIn.from_buffer(buf).output_mapping_count = 6
-    fcntl.ioctl(self.fd, _IO(IOCTL_QUERY_MAPPINGS), buf, True)
-    bars = list((TenstorrentMapping * 6).from_buffer(buf, in_sz))
+    io = QueryMappingsIoctl()
+    io.in_.output_mapping_count = 6
+    fcntl.ioctl(self.fd, IO_QUERY_MAPPINGS, io, True)
+    bar0, bar2 = io.out[0], io.out[2]
 
     # UC bars for bar0 and bar1 are 0,2 (the others are WC which is bad for reading/writing registers)
     # we don't need to mmap global vram (4+5), that is done through the dram tiles and the NoC
-    self.mm0 = mmap.mmap(self.fd, bars[0].mapping_size, flags=mmap.MAP_SHARED, prot=mmap.PROT_READ | mmap.PROT_WRITE, offset=bars[0].mapping_base)
-    self.mm1 = mmap.mmap(self.fd, bars[2].mapping_size, flags=mmap.MAP_SHARED, prot=mmap.PROT_READ | mmap.PROT_WRITE, offset=bars[2].mapping_base)
+    self.mm0 = mmap.mmap(self.fd, bar0.mapping_size, flags=mmap.MAP_SHARED, prot=mmap.PROT_READ | mmap.PROT_WRITE, offset=bar0.mapping_base)
+    self.mm1 = mmap.mmap(self.fd, bar2.mapping_size, flags=mmap.MAP_SHARED, prot=mmap.PROT_READ | mmap.PROT_WRITE, offset=bar2.mapping_base)
 
   def bar0_read32(self, addr: int) -> int:
     return struct.unpack_from("<I", self.mm0, addr)[0]
@@ -697,38 +722,34 @@ class Device:
 
   def reset(self, dmc_reset: bool = False) -> int:
     bdf = self.get_bdf()
-    in_sz, out_sz = ctypes.sizeof(ResetDeviceIn), ctypes.sizeof(ResetDeviceOut)
 
-    buf = bytearray(in_sz + out_sz)
-    view = ResetDeviceIn.from_buffer(buf)
-    view.output_size_bytes = out_sz
-    view.flags = TENSTORRENT_RESET_DEVICE_ASIC_DMC_RESET if dmc_reset else TENSTORRENT_RESET_DEVICE_ASIC_RESET
-    fcntl.ioctl(self.fd, _IO(IOCTL_RESET_DEVICE), buf, True)
+    io = self._reset_io
+    io.in_.output_size_bytes = SZ_RESET_DEVICE_OUT
+    io.in_.flags = TENSTORRENT_RESET_DEVICE_ASIC_DMC_RESET if dmc_reset else TENSTORRENT_RESET_DEVICE_ASIC_RESET
+    fcntl.ioctl(self.fd, IO_RESET_DEVICE, io, True)
     self._close()
 
-    # poll for device to come back (up to 10s)
-    for _ in range(50):
-      time.sleep(0.2)
-      if (path := find_dev_by_bdf(bdf)):
-        self.path = path
-        break
-    else:
+    # wait for device to come back (up to 10s); the old node can linger briefly, so don't probe right away
+    time.sleep(0.2)
+    if (path := wait_dev_by_bdf(bdf, timeout=10.0, ordinal=self.path.split('/')[-1])) is None:
       raise RuntimeError(f"device {bdf} didn't come back after reset")
+    self.path = path
 
-    self.fd = os.open(self.path, os.O_RDWR | os.O_CLOEXEC)
+    self.fd = open_dev(self.path)
 
     # POST_RESET reinits hardware
-    buf = bytearray(in_sz + out_sz)
-    view = ResetDeviceIn.from_buffer(buf)
-    view.output_size_bytes, view.flags = out_sz, TENSTORRENT_RESET_DEVICE_POST_RESET
-    fcntl.ioctl(self.fd, _IO(IOCTL_RESET_DEVICE), buf, True)
-    result = ResetDeviceOut.from_buffer(buf, in_sz).result
+    io.in_.output_size_bytes, io.in_.flags = SZ_RESET_DEVICE_OUT, TENSTORRENT_RESET_DEVICE_POST_RESET
+    fcntl.ioctl(self.fd, IO_RESET_DEVICE, io, True)
+    result = io.out.result
 
     self._setup(retried=True)
     return result
 
   def _get_arch(self):
     ordinal = self.path.split('/')[-1]
-    return Path(f"/sys/class/tenstorrent/tenstorrent!{ordinal}/tt_card_type").read_text().strip()
+    fd = os.open(f"/sys/class/tenstorrent/tenstorrent!{ordinal}/tt_card_type", os.O_RDONLY | os.O_CLOEXEC)
+    try: raw = os.read(fd, 32)
+    finally: os.close(fd)
+    return raw.strip().decode()
 
   def close(self): self._close()
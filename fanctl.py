@@ -3,7 +3,7 @@ import argparse, os, time
 from tlb import TLBWindow, TLBConfig, TLBMode, TLBSize
 from configs import Arc
 from device import TileGrid
-from helpers import align_down
+from helpers import align_down, open_dev
 
 FAN_MSG_FORCE_SPEED = 0xAC
 
@@ -72,7 +72,7 @@ def main():
   pct = None if args.reset else int(args.set)
   if pct is not None and not (0 <= pct <= 100): raise SystemExit("--set must be 0..100")
 
-  fd = os.open(args.dev, os.O_RDWR | os.O_CLOEXEC)
+  fd = open_dev(args.dev)
   try:
     raw = 0xFFFFFFFF if pct is None else pct
     resp = arc_msg(fd, FAN_MSG_FORCE_SPEED, raw, 0, timeout_ms=args.timeout_ms)
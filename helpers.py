@@ -1,7 +1,5 @@
-import os, fcntl, struct
-from ctypes import sizeof
-from abi import TENSTORRENT_IOCTL_MAGIC, TenstorrentGetDeviceInfoIn
-from abi import TenstorrentGetDeviceInfoOut, IOCTL_GET_DEVICE_INFO
+import ctypes, os, fcntl, mmap, select, stat, struct, threading, time
+from abi import GetDeviceInfoIoctl, IO_GET_DEVICE_INFO, SZ_GET_DEVICE_INFO_OUT
 from dataclasses import dataclass
 from pathlib import Path
 from configs import TLBSize, TensixL1
@@ -12,16 +10,6 @@ if _tt_home_env:
 else:
   TT_HOME = Path(__file__).resolve().parents[1]/"tt-metal"
 
-def _IO(nr: int) -> int: return (TENSTORRENT_IOCTL_MAGIC << 8) | nr
-
-def ioctl[T](fd: int, nr: int, in_cls, out_cls: type[T], **fields) -> T:
-  in_sz, out_sz = sizeof(in_cls), sizeof(out_cls) # type: ignore
-  buf = bytearray(in_sz + out_sz)
-  view = in_cls.from_buffer(buf)
-  for k, v in fields.items(): setattr(view, k, v)
-  fcntl.ioctl(fd, _IO(nr), buf, True)
-  return out_cls.from_buffer(buf, in_sz) # type: ignore
-
 def contiguous_ranges(xs: list[int]) -> list[tuple[int, int]]:
   if not xs: return []
   ranges, start = [], xs[0]
@@ -39,25 +27,82 @@ def align_down(value: int, alignment: TLBSize) -> tuple[int, int]:
 def noc1(x: int, y: int) -> tuple[int, int]:
   return (16 - x, 11 - y)  # MAX_X=16, MAX_Y=11 for blackhole
 
+# every tenstorrent fd is read/write and must not leak into child processes (e.g. the kernel compiler)
+def open_dev(path: str) -> int: return os.open(path, os.O_RDWR | os.O_CLOEXEC)
+
 def format_bdf(pci_domain: int, bus_dev_fn: int) -> str:
   return f"{pci_domain:04x}:{(bus_dev_fn >> 8) & 0xFF:02x}:{(bus_dev_fn >> 3) & 0x1F:02x}.{bus_dev_fn & 0x7}"
 
+# scratch GET_DEVICE_INFO ioctl shared by every probe, so polling allocates nothing.
+# the lock keeps Devices that reset() from different threads from clobbering each other's result
+_BDF_IO = GetDeviceInfoIoctl()
+_BDF_LOCK = threading.Lock()
+
 def _get_bdf_for_path(path: str) -> str | None:
+  # anything that isn't a character device can't be a card: reject it with a stat, not an open + ioctl
   try:
-    fd = os.open(path, os.O_RDWR | os.O_CLOEXEC)
-    info = ioctl(fd, IOCTL_GET_DEVICE_INFO, TenstorrentGetDeviceInfoIn,
-                 TenstorrentGetDeviceInfoOut, output_size_bytes=sizeof(TenstorrentGetDeviceInfoOut))
-    os.close(fd)
-    return format_bdf(info.pci_domain, info.bus_dev_fn)
+    if not stat.S_ISCHR(os.stat(path).st_mode): return None
+    fd = open_dev(path)
   except OSError: return None
+  try:
+    with _BDF_LOCK:
+      _BDF_IO.in_.output_size_bytes = SZ_GET_DEVICE_INFO_OUT
+      fcntl.ioctl(fd, IO_GET_DEVICE_INFO, _BDF_IO, True)
+      return format_bdf(_BDF_IO.out.pci_domain, _BDF_IO.out.bus_dev_fn)
+  except OSError: return None
+  finally: os.close(fd)
 
-def find_dev_by_bdf(target_bdf: str) -> str | None:
-  for entry in os.listdir("/dev/tenstorrent"):
+def _find_dev_by_bdf_ioctl(target_bdf: str, ordinal: str | None = None) -> str | None:
+  # devtmpfs drops /dev/tenstorrent while a reset card is gone; report "not found" so callers keep waiting
+  try: entries = os.listdir("/dev/tenstorrent")
+  except OSError: return None
+  entries.sort(key=lambda e: e != ordinal)  # likely match first
+  for entry in entries:
     if not entry.isdigit(): continue
     path = f"/dev/tenstorrent/{entry}"
     if _get_bdf_for_path(path) == target_bdf: return path
   return None
 
+# `ordinal` is where the card is expected to be (e.g. where it was before a reset); it is checked first
+def find_dev_by_bdf(target_bdf: str, ordinal: str | None = None) -> str | None:
+  # sysfs links tenstorrent!N to its PCI device (.../0000:01:00.0), so no open/ioctl is needed
+  try: entries = os.listdir("/sys/class/tenstorrent")
+  except OSError: return _find_dev_by_bdf_ioctl(target_bdf, ordinal)
+  entries.sort(key=lambda e: e != f"tenstorrent!{ordinal}")
+  for entry in entries:
+    n = entry.removeprefix("tenstorrent!")
+    if not n.isdigit(): continue
+    path = f"/dev/tenstorrent/{n}"
+    try: bdf = os.path.basename(os.readlink(f"/sys/class/tenstorrent/{entry}/device"))
+    except OSError: bdf = _get_bdf_for_path(path)  # no device link, ask the driver
+    # the sysfs entry can show up before udev has created (and chmod'ed) the device node
+    if bdf == target_bdf and os.access(path, os.R_OK | os.W_OK): return path
+  return None
+
+IN_ATTRIB, IN_MOVED_TO, IN_CREATE = 0x004, 0x080, 0x100
+
+def wait_dev_by_bdf(target_bdf: str, timeout: float, ordinal: str | None = None) -> str | None:
+  # sleep on inotify events from /dev/tenstorrent instead of polling blind. waits are still capped
+  # at 0.2s because devtmpfs drops the directory when its last node goes away, taking the watch with it
+  libc = ctypes.CDLL(None, use_errno=True)
+  ifd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+  deadline = time.monotonic() + timeout
+  try:
+    while True:
+      # (re)arm before probing so a node created in between still wakes us up
+      if ifd >= 0: libc.inotify_add_watch(ifd, b"/dev/tenstorrent", IN_CREATE | IN_ATTRIB | IN_MOVED_TO)
+      if (path := find_dev_by_bdf(target_bdf, ordinal)): return path
+      if (remaining := deadline - time.monotonic()) <= 0: return None
+      if ifd < 0:
+        time.sleep(min(remaining, 0.2))
+        continue
+      if select.select([ifd], [], [], min(remaining, 0.2))[0]:
+        try:
+          while os.read(ifd, 4096): pass
+        except BlockingIOError: pass
+  finally:
+    if ifd >= 0: os.close(ifd)
+
 @dataclass(frozen=True)
 class PTLoad:
   paddr: int
@@ -65,27 +110,31 @@ class PTLoad:
   memsz: int
   flags: int = 0
 
-def iter_pt_load(elf: bytes):
+_PHOFF = struct.Struct("<I")             # e_phoff
+_PHINFO = struct.Struct("<HH")           # e_phentsize, e_phnum
+_PHDR = struct.Struct("<IIIIIIII")       # Elf32_Phdr
+
+def iter_pt_load(elf: bytes | mmap.mmap):
   if elf[:4] != b"\x7fELF": raise ValueError("not an ELF")
   if elf[4] != 1: raise ValueError("expected ELF32")
   if elf[5] != 1: raise ValueError("expected little-endian")
 
-  e_phoff = struct.unpack_from("<I", elf, 28)[0]
-  e_phentsize, e_phnum = struct.unpack_from("<HH", elf, 42)
-  if e_phentsize < 32: raise ValueError(f"bad e_phentsize: {e_phentsize}")
+  e_phoff = _PHOFF.unpack_from(elf, 28)[0]
+  e_phentsize, e_phnum = _PHINFO.unpack_from(elf, 42)
+  if e_phentsize != _PHDR.size: raise ValueError(f"bad e_phentsize: {e_phentsize}")
   if e_phoff + e_phentsize * e_phnum > len(elf): raise ValueError("ELF truncated")
 
-  for i in range(e_phnum):
-    off = e_phoff + i * e_phentsize
-    p_type, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_flags, _ = struct.unpack_from("<IIIIIIII", elf, off)
+  # decode the whole program header table in one C-level pass
+  for p_type, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_flags, _ in _PHDR.iter_unpack(elf[e_phoff:e_phoff + _PHDR.size * e_phnum]):
     if p_type != 1: continue  # PT_LOAD
     if p_offset + p_filesz > len(elf): raise ValueError("ELF truncated")
     paddr = p_paddr or p_vaddr
     yield PTLoad(paddr=paddr, data=elf[p_offset:p_offset + p_filesz], memsz=p_memsz, flags=p_flags)
 
 def load_pt_load(path: str | os.PathLike[str]) -> list[PTLoad]:
-  with open(os.fspath(path), "rb") as f:
-    return list(iter_pt_load(f.read()))
+  # map the file instead of reading it whole: only the PT_LOAD payloads get copied out
+  with open(os.fspath(path), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as elf:
+    return list(iter_pt_load(elf))
 
 def generate_jal_instruction(target_addr: int) -> int:
   """Generate RISC-V JAL x0, offset instruction for BRISC bootstrap.
@@ -1,8 +1,10 @@
 from dataclasses import dataclass
 from enum import Enum
-from abi import *
+from abi import AllocateTlbIn, AllocateTlbOut, ConfigureTlbIn, FreeTlbIn, NocTlbConfig, as_bytes
+from abi import IO_ALLOCATE_TLB, IO_CONFIGURE_TLB, IO_FREE_TLB
+from abi import SZ_ALLOCATE_TLB_IN, SZ_ALLOCATE_TLB_OUT, SZ_CONFIGURE_TLB_IN, SZ_FREE_TLB_IN, SZ_NOC_TLB_CONFIG
 from configs import TLBSize
-from helpers import _IO, noc1
+from helpers import noc1
 import fcntl, mmap
 
 class TLBMode(Enum):
@@ -45,16 +47,17 @@ class TLBWindow:
     self.fd = fd
     self.size = size.value
     self.config: TLBConfig | None = None
+    self._programmed: bytes | None = None  # raw NocTlbConfig last sent to the driver
     self._allocate(size)
     self._mmap()
     if config is not None: self.configure(config)
 
   def _allocate(self, size: TLBSize):
-    buf = bytearray(sizeof(AllocateTlbIn) + sizeof(AllocateTlbOut))
+    buf = bytearray(SZ_ALLOCATE_TLB_IN + SZ_ALLOCATE_TLB_OUT)
     cfg = AllocateTlbIn.from_buffer(buf)
     cfg.size = size.value
-    fcntl.ioctl(self.fd, _IO(IOCTL_ALLOCATE_TLB), buf, True)
-    out = AllocateTlbOut.from_buffer(buf, sizeof(AllocateTlbIn))
+    fcntl.ioctl(self.fd, IO_ALLOCATE_TLB, buf, True)
+    out = AllocateTlbOut.from_buffer(buf, SZ_ALLOCATE_TLB_IN)
     self.tlb_id = out.tlb_id
     self._mmap_offset_uc = out.mmap_offset_uc
     self._mmap_offset_wc = out.mmap_offset_wc
@@ -68,11 +71,15 @@ class TLBWindow:
 
   def configure(self, config: TLBConfig):
     assert (config.addr & (self.size - 1)) == 0, f"tlb addr must be {self.size}-aligned"
-    buf = bytearray(sizeof(ConfigureTlbIn) + sizeof(NocTlbConfig))
-    cfg = ConfigureTlbIn.from_buffer(buf)
-    cfg.tlb_id = self.tlb_id
-    cfg.config = config.to_struct()
-    fcntl.ioctl(self.fd, _IO(IOCTL_CONFIGURE_TLB), buf, False)
+    noc_cfg = config.to_struct()
+    # the window owns its TLB, so reprogramming it with an identical config is a wasted ioctl
+    if (raw := as_bytes(noc_cfg)) != self._programmed:
+      buf = bytearray(SZ_CONFIGURE_TLB_IN + SZ_NOC_TLB_CONFIG)
+      cfg = ConfigureTlbIn.from_buffer(buf)
+      cfg.tlb_id = self.tlb_id
+      cfg.config = noc_cfg
+      fcntl.ioctl(self.fd, IO_CONFIGURE_TLB, buf, False)
+      self._programmed = raw
     self.config = config
 
   def write(self, addr: int, data: bytes, use_uc: bool = False, restore: bool = True):
@@ -95,6 +102,9 @@ class TLBWindow:
         config.addr = prev
         self.configure(config)
 
+  def read(self, offset: int, nbytes: int) -> bytes:
+    return self.uc[offset:offset+nbytes]
+
   def readi32(self, offset: int) -> int:
     return int.from_bytes(self.uc[offset:offset+4], 'little')
 
@@ -104,10 +114,10 @@ class TLBWindow:
   def free(self):
     self.uc.close()
     self.wc.close()
-    buf = bytearray(sizeof(FreeTlbIn))
+    buf = bytearray(SZ_FREE_TLB_IN)
     cfg = FreeTlbIn.from_buffer(buf)
     cfg.tlb_id = self.tlb_id
-    fcntl.ioctl(self.fd, _IO(IOCTL_FREE_TLB), buf, False)
+    fcntl.ioctl(self.fd, IO_FREE_TLB, buf, False)
 
   def __enter__(self): return self
   def __exit__(self, *_): self.free()